@@ -1,82 +1,131 @@
 import cocotb
-from cocotb.handle import NonHierarchyIndexableObject
+from cocotb.handle import NonHierarchyIndexableObject, RegionObject
 import re
 import os
 import json
+import logging
+import secrets
+from collections import deque
 
-def find_reg_bank(dut, submodule_attr, signals_list):
-    if signals_list == None: # starting with dut
-        signals_list = []
-    if submodule_attr == None:
-        tmp_top_list = dir(dut)
-
-        top_submodules = []
-        for item in tmp_top_list:
-            # get only valid signal/submodules
-            if item[0] != '_' and item != "get_definition_name" and item != "get_definition_file":
-                # check whether it is a signal or a submodule
-                item_dir = dir(getattr(dut, item))
-                if item_dir[-1] == 'value':
-                    try:
-                        value = getattr(dut, item)
-                        if isinstance(value, NonHierarchyIndexableObject) and len(set(str(value.value).lower())) > 2:
-                                signals_list.append([dut, item])
-                    except IndexError:
-                        pass
-                    except TypeError:   
-                        pass
-                else:
-                    top_submodules.append(item)
-        for submodule in top_submodules:
-            submodule_attr = getattr(dut, submodule)
-            find_reg_bank(dut, submodule_attr, signals_list)
+try:
+    import orjson
+except ImportError:  # fall back to the standard library encoder
+    orjson = None
+
+def dump_labels(data, json_file):
+    """Serialize the labels dict into an open text file.
+
+    Uses orjson when it is installed, since json.dump with indent falls back
+    to the pure Python encoder.
+    """
+    if orjson is not None:
+        json_file.write(orjson.dumps(data, option=orjson.OPT_INDENT_2).decode('utf-8'))
     else:
-        tmp_submodule_list = dir(submodule_attr)
-
-        submodule_submodules = []
-        for item in tmp_submodule_list:
-            # get only valid signal/submodules
-            if item[0] != '_' and item != "get_definition_name" and item != "get_definition_file":
-                # check whether it is a signal or a submodule
-                item_dir = dir(getattr(submodule_attr, item))
-                if item_dir[-1] == 'value':
-                    try:
-                        value = getattr(submodule_attr, item)
-                        if isinstance(value, NonHierarchyIndexableObject) and len(set(str(value.value).lower())) > 2:
-                                signals_list.append([submodule_attr, item])
-                    except IndexError:
-                        pass
-                    except TypeError: 
-                        pass
-                else:
-                    submodule_submodules.append(item)
-        for submodule in submodule_submodules:
-            if len(submodule_submodules) != 0:
-                new_submodule_attr = getattr(submodule_attr, submodule)
-                find_reg_bank(dut, new_submodule_attr, signals_list)
+        json.dump(data, json_file, indent=2)
+
+def write_json_atomic(output_file, data):
+    """Write data as JSON so readers never see a partially written file.
+
+    The JSON is written to a temporary file next to output_file, named after
+    the process and a random suffix so concurrent writers never share it,
+    which then replaces output_file in a single rename.
+
+    Args:
+        output_file (str): Path of the JSON file.
+        data (dict): Data to serialize.
+    """
+    tmp_file = f'{output_file}.{os.getpid()}.{secrets.token_hex(4)}.tmp'
+    # O_EXCL never opens an existing file, and the 0o666 mode goes through
+    # the process umask just like open() does
+    fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as json_file:
+            dump_labels(data, json_file)
+        os.replace(tmp_file, output_file)
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+
+def has_readable_element(signal):
+    """Check whether the first element of an array signal holds a value.
+
+    Only that element is read, instead of stringifying the whole array.
+    """
+    return bool(signal[0].value.binstr)
+
+def find_reg_bank(dut, stop_when=None):
+    """Find the array signals that may hold the register bank.
+
+    The hierarchy is walked breadth-first with a work queue instead of
+    recursing into every submodule.
+
+    Args:
+        dut: The design under test.
+        stop_when: Optional predicate on a candidate handle; the walk stops
+            right after the first candidate for which it returns True.
+
+    Returns:
+        List of candidate array handles.
+    """
+    signals_list = []
+    append_signal = signals_list.append
+    queue = deque([dut])
+    seen = set()
+
+    while queue:
+        node = queue.popleft()
+        # key on the hierarchical path, handle ids can be reused once freed
+        path = node._path
+        if path in seen:
+            continue
+        seen.add(path)
+
+        # iterating a hierarchy handle yields its children directly,
+        # without resolving every attribute name through dir() and getattr
+        for child in node:
+            # submodules and generate scopes are explored, arrays are candidates,
+            # any other signal cannot be a register bank
+            if isinstance(child, RegionObject):
+                queue.append(child)
+            elif isinstance(child, NonHierarchyIndexableObject):
+                try:
+                    if has_readable_element(child):
+                        append_signal(child)
+                        if stop_when is not None and stop_when(child):
+                            return signals_list
+                except (IndexError, TypeError, AttributeError):
+                    pass
     return signals_list
 
-def count_bits(dut, signals_list):
-    """Find the register bank in the list of signals.
+def is_word_sized(signal):
+    """Check whether the elements of an array signal are 32 or 64 bits wide."""
+    try:
+        return len(signal[0]) in (32, 64)
+    except (IndexError, TypeError):
+        return False
+
+def count_bits(dut):
+    """Find the width of the register bank registers.
 
     Args:
-        signals_list: List of signals.
+        dut: The design under test.
 
     Returns:
-        The register bank signal if found, otherwise None.
+        The register width if found, otherwise None.
     """
 
-    signals_list = find_reg_bank(dut, None, None)
+    signals_list = find_reg_bank(dut, stop_when=is_word_sized)
 
     if len(signals_list) == 0:
         print("No register_bank found")
         return None
-    elif len(signals_list) == 1:
-        return len(getattr(signals_list[0][0], signals_list[0][1])[0])
-    else:
-        for signal in signals_list:
-            if len(getattr(signal[0], signal[1])[0]) == 32 or len(getattr(signal[0], signal[1])[0]) == 64:
-                return len(getattr(signal[0], signal[1])[0])
+
+    # the walk stops at the first word-sized candidate, so only the last one
+    # can be 32 or 64 bits wide; a lone candidate is taken whatever its width
+    width = len(signals_list[-1][0])
+    if len(signals_list) == 1 or width in (32, 64):
+        return width
+    return None
 
 
 @cocotb.test()
@@ -87,32 +136,17 @@ async def processor_test(dut):
         dut: The design under test.
     """
 
-    bits = count_bits(dut, None)
+    bits = count_bits(dut)
     
     output_dir = os.environ.get('OUTPUT_DIR', "default")
     processor_name = os.path.basename(output_dir)
     print(f"Processor name: {output_dir}")
 
-    output_file = os.path.join(output_dir, f"{processor_name}_labels.json")
-
-    if not os.path.exists(output_file):
-        with open(output_file, 'w', encoding='utf-8') as json_file:
-            json.dump({}, json_file, indent=4)
-
-    # Load existing JSON data
-    try:
-        with open(output_file, 'r', encoding='utf-8') as json_file:
-            existing_data = json.load(json_file)
-    except (json.JSONDecodeError, OSError) as e:
-        logging.warning('Error reading existing JSON file: %s', e)
-        existing_data = {}
-
-    existing_data[processor_name]["bits"] = bits
+    # Results go to a sidecar file that core_labeler merges into the labels JSON
+    output_file = os.path.join(output_dir, f"{processor_name}_cocotb.json")
 
-    # Save the updated data back to the JSON file
     try:
-        with open(output_file, 'w', encoding='utf-8') as json_file:
-            json.dump(existing_data, json_file, indent=4)
+        write_json_atomic(output_file, {"bits": bits})
         print(f'Results saved to {output_file}')
     except OSError as e:
         logging.warning('Error writing to JSON file: %s', e)
@@ -7,6 +7,13 @@ if module_path not in sys.path:
     sys.path.append(module_path)
 from config import load_config
 
+# Simulator, TOPLEVEL_LANG, COMPILE_ARGS template and Makefile variable prefix per language
+LANGUAGE_TABLE = {
+    'verilog': ('icarus', 'verilog', '-g{version}', 'VERILOG'),
+    'systemverilog': ('verilator', 'systemverilog', '--language 1800-{version}', 'SYSTEMVERILOG'),
+    'vhdl': ('ghdl', 'vhdl', '--std={version}', 'VHDL'),
+}
+
 def create_cocotb_makefile(processor_name: str, config_file: str, output_dir: str, cocotb_name: str = 'cocotb_labeler'):
     """Create a Makefile for cocotb simulation.
 
@@ -16,29 +23,13 @@ def create_cocotb_makefile(processor_name: str, config_file: str, output_dir: st
         output_dir (str): Directory to save the generated Makefile.
         cocotb_name (str): Name of the cocotb module. Defaults to 'cocotb_labeler'.
     """
-    logging.basicConfig(
-        level=logging.WARNING,
-        format='%(levelname)s: %(message)s',
-    )
-    # Ensure the output folder exists
-    os.makedirs(output_dir, exist_ok=True)
-
     processor_dir = os.path.join(output_dir, processor_name)
-    # Ensure the processor directory exists
+    # Ensure the processor directory exists, along with the output folder
     os.makedirs(processor_dir, exist_ok=True)
 
     # Define the Makefile path
     makefile_path = os.path.join(processor_dir, f'{processor_name}.mk')
 
-    # Check if the Makefile already exists
-    if os.path.exists(makefile_path):
-        os.remove(makefile_path)
-
-    with open(makefile_path, 'w', encoding='utf-8') as makefile:
-        makefile.write('# Makefile generated by create_cocotb_makefile.py\n')
-        makefile.write('# Do not edit this file manually.\n')
-        makefile.write('\n')
-
     # Load the configuration file
     config = load_config(config_file, processor_name)
 
@@ -49,46 +40,45 @@ def create_cocotb_makefile(processor_name: str, config_file: str, output_dir: st
     language_version = config['language_version']
 
     # Check which language to use
-    if any(file.endswith('.v') for file in sim_files):
+    extensions = {os.path.splitext(file)[1] for file in sim_files}
+    if '.v' in extensions:
         language = 'verilog'
-    elif any(file.endswith('.sv') for file in sim_files):
+    elif '.sv' in extensions:
         language = 'systemverilog'
-    elif any(file.endswith('.vhdl') or file.endswith('.vhd') for file in sim_files):
+    elif '.vhdl' in extensions or '.vhd' in extensions:
         language = 'vhdl'
     else:
         raise ValueError("No valid source files found.")
 
-    # Write the Makefile content
-    with open(makefile_path, 'a', encoding='utf-8') as makefile:
-        if language == 'verilog':
-            makefile.write('SIM ?= icarus\n')
-            makefile.write('TOPLEVEL_LANG ?= verilog\n')
-            makefile.write(f'COMPILE_ARGS ?= -g{language_version}\n')
-            for dirs in inc_dir:
-                makefile.write(f'VERILOG_INCLUDE_DIRS = /jenkins/jenkins_home/workspace/{processor_name}/{processor_name}/{dirs}\n')
-            for file in sim_files:
-                makefile.write(f'VERILOG_SOURCES += /jenkins/jenkins_home/workspace/{processor_name}/{processor_name}/{file}\n')
-        elif language == 'systemverilog':
-            makefile.write('SIM ?= verilator\n')
-            makefile.write('TOPLEVEL_LANG ?= systemverilog\n')
-            makefile.write(f'COMPILE_ARGS ?= --language 1800-{language_version}\n')
-            for dirs in inc_dir:
-                makefile.write(f'SYSTEMVERILOG_INCLUDE_DIRS = /jenkins/jenkins_home/workspace/{processor_name}/{processor_name}/{dirs}\n')
-            for file in sim_files:
-                makefile.write(f'SYSTEMVERILOG_SOURCES += /jenkins/jenkins_home/workspace/{processor_name}/{processor_name}/{file}\n')
-        elif language == 'vhdl':
-            makefile.write('SIM ?= ghdl\n')
-            makefile.write('TOPLEVEL_LANG ?= vhdl\n')
-            makefile.write(f'COMPILE_ARGS ?= --std={language_version}\n')
-            for dirs in inc_dir:
-                makefile.write(f'VHDL_INCLUDE_DIRS = /jenkins/jenkins_home/workspace/{processor_name}/{processor_name}/{dirs}\n')
-            for file in sim_files:
-                makefile.write(f'VHDL_SOURCES += /jenkins/jenkins_home/workspace/{processor_name}/{processor_name}/{file}\n')
-        makefile.write(f'TOPLEVEL = {top_module}\n')
-        makefile.write(f'MODULE = {cocotb_name}\n')
-        makefile.write(f'OUTPUT_DIR = {output_dir}/{processor_name}\n')
-        makefile.write('export OUTPUT_DIR\n')
-        makefile.write('include $(shell cocotb-config --makefiles)/Makefile.sim\n')
+    # Build the Makefile content
+    parts = [
+        '# Makefile generated by create_cocotb_makefile.py\n',
+        '# Do not edit this file manually.\n',
+        '\n',
+    ]
+    simulator, toplevel_lang, compile_args, var_prefix = LANGUAGE_TABLE[language]
+    parts.append(f'SIM ?= {simulator}\n')
+    parts.append(f'TOPLEVEL_LANG ?= {toplevel_lang}\n')
+    parts.append(f'COMPILE_ARGS ?= {compile_args.format(version=language_version)}\n')
+    workspace_dir = f'/jenkins/jenkins_home/workspace/{processor_name}/{processor_name}'
+    include_prefix = f'{var_prefix}_INCLUDE_DIRS = {workspace_dir}/'
+    source_prefix = f'{var_prefix}_SOURCES += {workspace_dir}/'
+    for dirs in inc_dir:
+        parts.append(f'{include_prefix}{dirs}\n')
+    for file in sim_files:
+        parts.append(f'{source_prefix}{file}\n')
+    parts.append(f'TOPLEVEL = {top_module}\n')
+    parts.append(f'MODULE = {cocotb_name}\n')
+    parts.append(f'OUTPUT_DIR = {output_dir}/{processor_name}\n')
+    parts.append('export OUTPUT_DIR\n')
+    # Keep build products per processor so several cores can be simulated at once
+    parts.append('SIM_BUILD = $(OUTPUT_DIR)/sim_build\n')
+    parts.append('COCOTB_RESULTS_FILE = $(OUTPUT_DIR)/results.xml\n')
+    parts.append('include $(shell cocotb-config --makefiles)/Makefile.sim\n')
+
+    # Write the whole Makefile at once, replacing any previous one
+    with open(makefile_path, 'w', encoding='utf-8') as makefile:
+        makefile.write(''.join(parts))
 
     return makefile_path
 
@@ -106,6 +96,10 @@ def main(processor_name: str, config_file: str, output_dir: str, cocotb_name: st
     return makefile_path
 
 if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(levelname)s: %(message)s',
+    )
     parser = argparse.ArgumentParser(description='Create a cocotb Makefile for simulation.')
     parser.add_argument(
         '-n', 
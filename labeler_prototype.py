@@ -6,16 +6,149 @@ import argparse
 import os
 import logging
 import cocotb
-import shlex
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from cocotb_makefile_creator import create_cocotb_makefile
+from cocotb_labeler import write_json_atomic
 module_path = os.path.abspath(os.path.join('..','/eda/processor_ci/core'))
 if module_path not in sys.path:
     sys.path.append(module_path)
 from config import load_config
 
+try:
+    import orjson
+except ImportError:  # fall back to the standard library encoder
+    orjson = None
+
 EXTENSIONS = ['v', 'sv', 'vhdl', 'vhd']
 
+# Only the head of a license file is scanned, larger files are not license texts
+LICENSE_READ_SIZE = 64 * 1024
+LICENSE_MAX_SIZE = 1024 * 1024
+
+LICENSE_PATTERNS = {
+    # Permissive Licenses
+    'MIT': r'permission is hereby granted, free of charge, to any person obtaining a copy',
+    'Apache 2.0': r'licensed under the Apache License, Version 2\.0',
+    'BSD 2-Clause': (
+        r'Redistribution and use in source and binary forms, with or without modification, '
+        r'are permitted provided that the following conditions are met:\s*'
+        r'1\.\s*Redistributions of source code must retain the above copyright notice, '
+        r'this list of conditions and the following disclaimer\.\s*'
+        r'2\.\s*Redistributions in binary form must reproduce the above copyright notice, '
+        r'this list of conditions and the following disclaimer in the documentation '
+        r'and/or other materials provided with the distribution\.\s*'
+        r'THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"'
+    ),
+    'BSD 3-Clause': (
+        r'neither the name of the copyright holder nor the names of its\s+contributors '
+        r'may be used to endorse or promote products derived from\s+this '
+        r'software without specific prior written permission\.'
+    ),
+    'ISC': (
+        r'Permission to use, copy, modify, and distribute this software for any '
+        r'purpose(?:\n|\s)*with or without fee is hereby granted, provided that the above '
+        r'copyright notice(?:\n|\s)*and this permission notice appear in all copies\.(?:\n|\s)*'
+        r'THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES(?:\n|\s)*'
+        r'INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS '
+        r'FOR A PARTICULAR PURPOSE\.'
+    ),
+    # Other licenses...
+    'Zlib': (
+        r'This software is provided \'as-is\', without any express or implied warranty'
+    ),
+    'Unlicense': (
+        r'This is free and unencumbered software released into the public domain'
+    ),
+    # CERN Open Hardware Licenses
+    'CERN Open Hardware Licence v2 - Permissive': r'The CERN-OHL-P is copyright CERN 2020.',
+    'CERN Open Hardware Licence v2 - Weakly Reciprocal': (
+        r'The CERN-OHL-W is copyright CERN 2020.'
+    ),
+    'CERN Open Hardware Licence v2 - Strongly Reciprocal': (
+        r'The CERN-OHL-S is copyright CERN 2020.'
+    ),
+    # Copyleft Licenses
+    'GPLv2': r'GNU GENERAL PUBLIC LICENSE\s*Version 2',
+    'GPLv3': r'GNU GENERAL PUBLIC LICENSE\s*Version 3',
+    'LGPLv2.1': r'Lesser General Public License\s*Version 2\.1',
+    'LGPLv3': r'Lesser General Public License\s*Version 3',
+    'MPL 2.0': r'Mozilla Public License\s*Version 2\.0',
+    'Eclipse Public License': r'Eclipse Public License - v [0-9]\.[0-9]',
+    # Creative Commons Licenses
+    'CC0': r'Creative Commons Zero',
+    'Creative Commons Attribution (CC BY)': (
+        r'This work is licensed under a Creative Commons Attribution'
+    ),
+    'Creative Commons Attribution-ShareAlike (CC BY-SA)': (
+        r'This work is licensed under a Creative Commons Attribution-ShareAlike'
+    ),
+    'Creative Commons Attribution-NoDerivatives (CC BY-ND)': (
+        r'This work is licensed under a Creative Commons Attribution-NoDerivatives'
+    ),
+    'Creative Commons Attribution-NonCommercial (CC BY-NC)': (
+        r'This work is licensed under a Creative Commons Attribution-NonCommercial'
+    ),
+    'Creative Commons Attribution-NonCommercial-ShareAlike (CC BY-NC-SA)': (
+        r'This work is licensed under a Creative Commons '
+        r'Attribution-NonCommercial-ShareAlike'
+    ),
+    'Creative Commons Attribution-NonCommercial-NoDerivatives (CC BY-NC-ND)': (
+        r'This work is licensed under a Creative Commons '
+        r'Attribution-NonCommercial-NoDerivatives'
+    ),
+    # Public Domain
+    'Public Domain': r'dedicated to the public domain',
+    # Proprietary Licenses
+    'Proprietary': r'\ball rights reserved\b.*?(license|copyright|terms)',
+    # Academic and Other Specialized Licenses
+    'Artistic License': r'This package is licensed under the Artistic License',
+    'Academic Free License': r'Academic Free License',
+}
+
+# Lowercase literal that every match of the corresponding pattern contains,
+# searched with a plain substring test before running the regex
+LICENSE_ANCHORS = {
+    'MIT': 'permission is hereby granted, free of charge',
+    'Apache 2.0': 'licensed under the apache license, version 2.0',
+    'BSD 2-Clause': 'redistribution and use in source and binary forms',
+    'BSD 3-Clause': 'neither the name of the copyright holder nor the names of its',
+    'ISC': 'permission to use, copy, modify, and distribute this software for any',
+    'Zlib': "this software is provided 'as-is'",
+    'Unlicense': 'this is free and unencumbered software',
+    'CERN Open Hardware Licence v2 - Permissive': 'the cern-ohl-p is copyright cern 2020',
+    'CERN Open Hardware Licence v2 - Weakly Reciprocal': 'the cern-ohl-w is copyright cern 2020',
+    'CERN Open Hardware Licence v2 - Strongly Reciprocal': 'the cern-ohl-s is copyright cern 2020',
+    'GPLv2': 'gnu general public license',
+    'GPLv3': 'gnu general public license',
+    'LGPLv2.1': 'lesser general public license',
+    'LGPLv3': 'lesser general public license',
+    'MPL 2.0': 'mozilla public license',
+    'Eclipse Public License': 'eclipse public license - v ',
+    'CC0': 'creative commons zero',
+    'Creative Commons Attribution (CC BY)': 'creative commons attribution',
+    'Creative Commons Attribution-ShareAlike (CC BY-SA)': 'creative commons attribution-sharealike',
+    'Creative Commons Attribution-NoDerivatives (CC BY-ND)': 'creative commons attribution-noderivatives',
+    'Creative Commons Attribution-NonCommercial (CC BY-NC)': 'creative commons attribution-noncommercial',
+    'Creative Commons Attribution-NonCommercial-ShareAlike (CC BY-NC-SA)': (
+        'creative commons attribution-noncommercial-sharealike'
+    ),
+    'Creative Commons Attribution-NonCommercial-NoDerivatives (CC BY-NC-ND)': (
+        'creative commons attribution-noncommercial-noderivatives'
+    ),
+    'Public Domain': 'dedicated to the public domain',
+    'Proprietary': 'all rights reserved',
+    'Artistic License': 'this package is licensed under the artistic license',
+    'Academic Free License': 'academic free license',
+}
+
+# Compiled once at import, checked in order by identify_license_type
+COMPILED_LICENSE_PATTERNS = [
+    (name, re.compile(pattern, re.IGNORECASE), LICENSE_ANCHORS[name])
+    for name, pattern in LICENSE_PATTERNS.items()
+]
+
+
 def find_license_files(directory: str) -> list[str]:
     """Find all LICENSE files in the given directory.
 
@@ -25,30 +158,20 @@ def find_license_files(directory: str) -> list[str]:
     Returns:
         list: A list of LICENSE file paths.
     """
-    logging.basicConfig(
-        level=logging.WARNING, format='%(levelname)s: %(message)s'
-    )
-
-    try:
-        result = subprocess.run(
-            ['find', directory, '-type', 'f', '-iname', '*LICENSE*'],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True,
-        )
-        if result.stderr:
-            logging.warning('Error: %s', result.stderr)
-            return []
-        return (
-            result.stdout.strip().split('\n') if result.stdout.strip() else []
-        )
-    except subprocess.CalledProcessError as e:
-        logging.warning('Error executing find command: %s', e)
-        return []
-    except FileNotFoundError as e:
-        logging.warning('Find command not found: %s', e)
-        return []
+    license_files = []
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and 'license' in entry.name.lower():
+                        license_files.append(entry.path)
+        except OSError as e:
+            logging.warning('Error scanning directory %s: %s', current, e)
+    return license_files
 
 
 def identify_license_type(license_content):
@@ -60,92 +183,65 @@ def identify_license_type(license_content):
     Returns:
         str: The type of license.
     """
-    license_patterns = {
-        # Permissive Licenses
-        'MIT': r'(?i)permission is hereby granted, free of charge, to any person obtaining a copy',
-        'Apache 2.0': r'(?i)licensed under the Apache License, Version 2\.0',
-        'BSD 2-Clause': (
-            r'(?i)Redistribution and use in source and binary forms, with or without modification, '
-            r'are permitted provided that the following conditions are met:\s*'
-            r'1\.\s*Redistributions of source code must retain the above copyright notice, '
-            r'this list of conditions and the following disclaimer\.\s*'
-            r'2\.\s*Redistributions in binary form must reproduce the above copyright notice, '
-            r'this list of conditions and the following disclaimer in the documentation '
-            r'and/or other materials provided with the distribution\.\s*'
-            r'THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"'
-        ),
-        'BSD 3-Clause': (
-            r'(?i)neither the name of the copyright holder nor the names of its\s+contributors '
-            r'may be used to endorse or promote products derived from\s+this '
-            r'software without specific prior written permission\.'
-        ),
-        'ISC': (
-            r'(?i)Permission to use, copy, modify, and distribute this software for any '
-            r'purpose(?:\n|\s)*with or without fee is hereby granted, provided that the above '
-            r'copyright notice(?:\n|\s)*and this permission notice appear in all copies\.(?:\n|\s)*'
-            r'THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES(?:\n|\s)*'
-            r'INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS '
-            r'FOR A PARTICULAR PURPOSE\.'
-        ),
-        # Other licenses...
-        'Zlib': (
-            r'(?i)This software is provided \'as-is\', without any express or implied warranty'
-        ),
-        'Unlicense': (
-            r'(?i)This is free and unencumbered software released into the public domain'
-        ),
-        # CERN Open Hardware Licenses
-        'CERN Open Hardware Licence v2 - Permissive': r'(?i)The CERN-OHL-P is copyright CERN 2020.',
-        'CERN Open Hardware Licence v2 - Weakly Reciprocal': (
-            r'(?i)The CERN-OHL-W is copyright CERN 2020.'
-        ),
-        'CERN Open Hardware Licence v2 - Strongly Reciprocal': (
-            r'(?i)The CERN-OHL-S is copyright CERN 2020.'
-        ),
-        # Copyleft Licenses
-        'GPLv2': r'(?i)GNU GENERAL PUBLIC LICENSE\s*Version 2',
-        'GPLv3': r'(?i)GNU GENERAL PUBLIC LICENSE\s*Version 3',
-        'LGPLv2.1': r'(?i)Lesser General Public License\s*Version 2\.1',
-        'LGPLv3': r'(?i)Lesser General Public License\s*Version 3',
-        'MPL 2.0': r'(?i)Mozilla Public License\s*Version 2\.0',
-        'Eclipse Public License': r'(?i)Eclipse Public License - v [0-9]\.[0-9]',
-        # Creative Commons Licenses
-        'CC0': r'(?i)Creative Commons Zero',
-        'Creative Commons Attribution (CC BY)': (
-            r'(?i)This work is licensed under a Creative Commons Attribution'
-        ),
-        'Creative Commons Attribution-ShareAlike (CC BY-SA)': (
-            r'(?i)This work is licensed under a Creative Commons Attribution-ShareAlike'
-        ),
-        'Creative Commons Attribution-NoDerivatives (CC BY-ND)': (
-            r'(?i)This work is licensed under a Creative Commons Attribution-NoDerivatives'
-        ),
-        'Creative Commons Attribution-NonCommercial (CC BY-NC)': (
-            r'(?i)This work is licensed under a Creative Commons Attribution-NonCommercial'
-        ),
-        'Creative Commons Attribution-NonCommercial-ShareAlike (CC BY-NC-SA)': (
-            r'(?i)This work is licensed under a Creative Commons '
-            r'Attribution-NonCommercial-ShareAlike'
-        ),
-        'Creative Commons Attribution-NonCommercial-NoDerivatives (CC BY-NC-ND)': (
-            r'(?i)This work is licensed under a Creative Commons '
-            r'Attribution-NonCommercial-NoDerivatives'
-        ),
-        # Public Domain
-        'Public Domain': r'(?i)dedicated to the public domain',
-        # Proprietary Licenses
-        'Proprietary': r'(?i)\ball rights reserved\b.*?(license|copyright|terms)',
-        # Academic and Other Specialized Licenses
-        'Artistic License': r'(?i)This package is licensed under the Artistic License',
-        'Academic Free License': r'(?i)Academic Free License',
-    }
+    # Anchors are only a safe prefilter for ASCII text, where lower() folds
+    # case exactly like re.IGNORECASE does
+    lowered = license_content.lower() if license_content.isascii() else None
 
-    for license_name, pattern in license_patterns.items():
-        if re.search(pattern, license_content):
+    for license_name, pattern, anchor in COMPILED_LICENSE_PATTERNS:
+        if lowered is not None and anchor not in lowered:
+            continue
+        if pattern.search(license_content):
             return license_name
     return 'Custom License'
 
 
+def scan_license_file(license_file):
+    """Read the head of a LICENSE file and identify its license type.
+
+    Args:
+        license_file (str): Path of the LICENSE file.
+
+    Returns:
+        str: The license type, 'Error' if the file could not be read, or
+        None if it is too large to be a license text.
+    """
+    # License files are small, so a raw descriptor and a single read are
+    # enough; no buffered file object is needed
+    try:
+        fd = os.open(license_file, os.O_RDONLY)
+        try:
+            if os.fstat(fd).st_size > LICENSE_MAX_SIZE:
+                logging.warning('Skipping %s: too large for a license file', license_file)
+                return None
+            content = os.read(fd, LICENSE_READ_SIZE).decode('utf-8', errors='replace')
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logging.warning('Error reading file %s: %s', license_file, e)
+        return 'Error'
+    return identify_license_type(content)
+
+
+def load_labels(output_file):
+    """Load a labels JSON file.
+
+    Args:
+        output_file (str): Path of the labels JSON file.
+
+    Returns:
+        dict: The labels, or an empty dict if the file is missing or invalid.
+    """
+    try:
+        with open(output_file, 'rb') as json_file:
+            content = json_file.read()
+        return orjson.loads(content) if orjson is not None else json.loads(content)
+    except FileNotFoundError:
+        return {}
+    except (json.JSONDecodeError, OSError) as e:
+        logging.warning('Error reading existing JSON file: %s', e)
+        return {}
+
+
 def generate_labels_file(
     processor_name, license_types, cpu_bits, cache, output_dir
 ):
@@ -153,66 +249,46 @@ def generate_labels_file(
 
     Args:
         processor_name (str): The name of the processor.
-        license_types (list{str}): List of license types.
+        license_types (Iterable[str]): License types, duplicates allowed.
         cpu_bits (int): CPU bit architecture.
         cache (bool): True if the CPU has cache, False otherwise.
         output_dir (str): The folder where the JSON file will be saved.
     """
-    logging.basicConfig(
-        level=logging.WARNING,
-        format='%(levelname)s: %(message)s',
-    )
-
-    # Ensure the output folder exists
-    os.makedirs(output_dir, exist_ok=True)
-
     processor_dir = os.path.join(output_dir, processor_name)
-    # Ensure the processor directory exists
+    # Ensure the processor directory exists, along with the output folder
     os.makedirs(processor_dir, exist_ok=True)
 
     # Define the output file path using the processor name
     output_file = os.path.join(processor_dir, f'{processor_name}_labels.json')
 
-    # Ensure the JSON file exists
-    if not os.path.exists(output_file):
-        with open(output_file, 'w', encoding='utf-8') as json_file:
-            json.dump({}, json_file, indent=4)
-
-    # Load existing JSON data
-    try:
-        with open(output_file, 'r', encoding='utf-8') as json_file:
-            existing_data = json.load(json_file)
-    except (json.JSONDecodeError, OSError) as e:
-        logging.warning('Error reading existing JSON file: %s', e)
-        existing_data = {}
-
-    existing_data[processor_name] = {
-        'license_types': list(set(license_types)),  # Deduplicate license types
-        'bits': cpu_bits,
-        'cache': cache,
+    # The file only ever holds this processor's labels, so it is written
+    # from scratch instead of being read and updated
+    labels = {
+        processor_name: {
+            'license_types': sorted(set(license_types)),  # Deduplicated, stable order
+            'bits': cpu_bits,
+            'cache': cache,
+        }
     }
 
-    # Write updated results back to JSON file
+    # Write the results to the JSON file
     try:
-        with open(output_file, 'w', encoding='utf-8') as json_file:
-            json.dump(existing_data, json_file, indent=4)
+        write_json_atomic(output_file, labels)
         print(f'Results saved to {output_file}')
     except OSError as e:
         logging.warning('Error writing to JSON file: %s', e)
 
 
-def core_labeler(directory, config_file, output_dir):
+def core_labeler(directory, config_file, output_dir, force=False):
     """Main function to find LICENSE files and generate labels.
 
     Args:
         directory (str): The directory to search for LICENSE files.
         config_file (str): Path to the configuration file.
         output_dir (str): Directory to save the generated files.
+        force (bool): Run the cocotb simulation even if the processor
+            already has its bits labeled. Defaults to False.
     """
-    logging.basicConfig(
-        level=logging.WARNING,
-        format='%(levelname)s: %(message)s',
-    )
     # Find all LICENSE files in the directory
     license_files = find_license_files(directory)
 
@@ -220,69 +296,97 @@ def core_labeler(directory, config_file, output_dir):
         logging.warning('No LICENSE files found in the directory.')
         return
 
-    license_types = []
+    # Reading and matching each file is independent, overlap the file reads
+    with ThreadPoolExecutor(max_workers=min(8, len(license_files))) as executor:
+        license_types = {
+            license_type
+            for license_type in executor.map(scan_license_file, license_files)
+            if license_type is not None
+        }
 
-    for license_file in license_files:
-        try:
-            with open(license_file, 'r', encoding='utf-8') as file:
-                content = file.read()
-                license_type = identify_license_type(content)
-                license_types.append(license_type)
-        except OSError as e:
-            logging.warning('Error reading file %s: %s', license_file, e)
-            license_types.append('Error')
-
-    # Create a Makefile for cocotb simulation
     processor_name = os.path.basename(os.path.normpath(directory))
-    makefile = create_cocotb_makefile(processor_name, config_file, output_dir)
 
+    # Keep the bits found by a previous simulation, no need to simulate again
     cpu_bits = None
+    if not force:
+        output_file = os.path.join(output_dir, processor_name, f'{processor_name}_labels.json')
+        cpu_bits = load_labels(output_file).get(processor_name, {}).get('bits')
+
     cache = False
-    generate_labels_file(processor_name, license_types, cpu_bits, cache, output_dir)
+    if cpu_bits is not None:
+        logging.info('Skipping simulation of %s: already labeled', processor_name)
+        generate_labels_file(processor_name, license_types, cpu_bits, cache, output_dir)
+        return
+
+    # Create a Makefile for cocotb simulation
+    makefile = create_cocotb_makefile(processor_name, config_file, output_dir)
 
-    ##venv_path = "/eda/processor_ci_utils/env"
-    bash_command = f"make -f {makefile} clean && make -f {makefile}"
+    # Make the cocotb test module importable whatever the working directory is
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [os.path.dirname(os.path.abspath(__file__)), env.get('PYTHONPATH')])
+    )
 
     try:
-        subprocess.run(bash_command, shell=True, check=True, executable="/bin/bash")
+        subprocess.run(['make', '-f', makefile, 'clean'], check=True, env=env)
+        subprocess.run(['make', '-f', makefile], check=True, env=env)
     except subprocess.CalledProcessError as e:
         logging.warning('Error executing make command: %s', e)
-        return
+    else:
+        # The cocotb test reports its results in a sidecar JSON file
+        results_file = os.path.join(output_dir, processor_name, f'{processor_name}_cocotb.json')
+        cpu_bits = load_labels(results_file).get('bits')
+        try:
+            os.remove(results_file)
+        except FileNotFoundError:
+            pass
 
-def main(directory, config_directory, output_directory):
+    generate_labels_file(processor_name, license_types, cpu_bits, cache, output_dir)
+
+def main(directory, config_directory, output_directory, force=False):
     """Main function to execute the core labeler.
 
     Args:
         directory (str): The directory to search for cores files.
         config_directory (str): The directory containing the configuration files.
         output_directory (str): The directory to save the generated files.
+        force (bool): Simulate cores that are already labeled. Defaults to False.
     """
-    logging.basicConfig(
-        level=logging.WARNING,
-        format='%(levelname)s: %(message)s',
-    )
     # Ensure the output folder exists
     os.makedirs(output_directory, exist_ok=True)
 
     # Get all subdirectories in the given directory
-    subdirectories = [
-        os.path.join(directory, d)
-        for d in os.listdir(directory)
-        if os.path.isdir(os.path.join(directory, d))
-    ]
-
-    for subdirectory in subdirectories:
-        if ('@' in subdirectory):
-            continue
-        core_labeler(
-            subdirectory,
-            config_directory,
-            output_directory,
-        )
-        print(f'Processed {subdirectory}')
+    with os.scandir(directory) as entries:
+        subdirectories = [entry.path for entry in entries if entry.is_dir()]
+
+    # Each core is labeled independently, so run them in parallel processes
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {
+            executor.submit(
+                core_labeler,
+                subdirectory,
+                config_directory,
+                output_directory,
+                force,
+            ): subdirectory
+            for subdirectory in subdirectories
+            if '@' not in subdirectory
+        }
+        for future in as_completed(futures):
+            subdirectory = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                logging.warning('Error processing %s: %s', subdirectory, e)
+                continue
+            print(f'Processed {subdirectory}')
 
         
 if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(levelname)s: %(message)s',
+    )
     parser = argparse.ArgumentParser(
         description='Find parameters of a RISC-V based CPU.'
     )
@@ -310,18 +414,26 @@ if __name__ == '__main__':
         default=False,
         help='Run in batch mode.',
     )
+    parser.add_argument(
+        '-f',
+        '--force',
+        action='store_true',
+        help='Simulate cores even if they are already labeled.',
+    )
     args = parser.parse_args()
     dir_to_search = args.dir
     config_json = args.config
     output_folder = args.output
     batch_mode = args.batch
+    force = args.force
     if batch_mode:
         # Run in batch mode
-        main(dir_to_search, config_json, output_folder)
+        main(dir_to_search, config_json, output_folder, force)
     else:
         # Run in interactive mode
         core_labeler(
             dir_to_search,
             config_json,
             output_folder,
+            force,
         )
\ No newline at end of file
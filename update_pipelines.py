@@ -1,7 +1,18 @@
 import os
-import xml.etree.ElementTree as ET
-import html
+import re
 import argparse
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+# Matches the first <script> element of a job config, including the
+# self-closing form. Only this span is rewritten; the rest of the file is
+# left byte for byte as Jenkins wrote it.
+SCRIPT_RE = re.compile(r'<script(\s[^>]*)?(?:/>|>.*?</script>)', re.DOTALL)
+
+# XML escapes for the pipeline script, applied in a single pass.
+SCRIPT_ESCAPES = str.maketrans(
+    {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&apos;'}
+)
 
 def update_jenkins_pipeline_script(config_path, jenkinsfile_path):
     """
@@ -17,28 +28,24 @@ def update_jenkins_pipeline_script(config_path, jenkinsfile_path):
             new_script_content = jenkinsfile.read()
 
         # Convert special characters: ' -> &apos;, " -> &quot;
-        escaped_script_content = html.escape(new_script_content).replace("&#x27;", "&apos;")
-
-        # Parse the XML file
-        tree = ET.parse(config_path)
-        root = tree.getroot()
-
-        # Find the <script> element
-        script_element = root.find(".//script")
-        if script_element is not None:
-            script_element.text = escaped_script_content
-        else:
+        escaped_script_content = new_script_content.translate(SCRIPT_ESCAPES)
+
+        # Read the raw XML, keeping its line endings untouched
+        with open(config_path, "r", encoding="utf-8", newline="") as file:
+            xml_str = file.read()
+
+        # Replace only the contents of the <script> element
+        xml_str, found = SCRIPT_RE.subn(
+            lambda m: f"<script{m.group(1) or ''}>{escaped_script_content}</script>",
+            xml_str,
+            count=1,
+        )
+        if not found:
             print(f"Error: <script> element not found in {config_path}")
             return False
 
-        # Convert the tree back to a string to remove unwanted `&amp;` occurrences
-        xml_str = ET.tostring(root, encoding="utf-8", xml_declaration=True).decode("utf-8")
-
-        # Remove every occurrence of `&amp;` from the XML string
-        xml_str = xml_str.replace("&amp;", "&")
-
-        # Write the cleaned XML back to the file
-        with open(config_path, "w", encoding="utf-8") as file:
+        # Write the updated XML back to the file
+        with open(config_path, "w", encoding="utf-8", newline="") as file:
             file.write(xml_str)
 
         print(f"Updated pipeline script for {config_path}")
@@ -48,6 +55,26 @@ def update_jenkins_pipeline_script(config_path, jenkinsfile_path):
         print(f"Error updating {config_path}: {e}")
         return False
 
+def update_processor_pipeline(processor, processor_folder, jenkinsfiles_folder):
+    """
+    Updates the config.xml of a single processor with its Jenkinsfile.
+
+    :param processor: Name of the processor folder and Jenkinsfile.
+    :param processor_folder: Path to the folder containing processor-named subfolders with config.xml files.
+    :param jenkinsfiles_folder: Path to the folder containing Jenkinsfiles named after processors.
+    """
+    config_path = os.path.join(processor_folder, processor, 'config.xml')
+    jenkinsfile_path = os.path.join(jenkinsfiles_folder, f'{processor}.Jenkinsfile')
+    print(jenkinsfile_path)
+
+    # Ensure both config.xml and Jenkinsfile exist
+    if os.path.exists(config_path) and os.path.exists(jenkinsfile_path):
+        print(f'Updating {processor} pipeline...')
+        update_jenkins_pipeline_script(config_path, jenkinsfile_path)
+    else:
+        print(f'Skipping {processor}: Missing config.xml or Jenkinsfile.')
+
+
 def bulk_update_jenkins_pipelines(processor_folder, jenkinsfiles_folder):
     """
     Updates all Jenkins config.xml files in processor folders with the corresponding Jenkinsfile.
@@ -55,24 +82,18 @@ def bulk_update_jenkins_pipelines(processor_folder, jenkinsfiles_folder):
     :param processor_folder: Path to the folder containing processor-named subfolders with config.xml files.
     :param jenkinsfiles_folder: Path to the folder containing Jenkinsfiles named after processors.
     """
-    # List all processor folders
-    processor_names = [
-        d
-        for d in os.listdir(processor_folder)
-        if os.path.isdir(os.path.join(processor_folder, d))
-    ]
-
-    for processor in processor_names:
-        config_path = os.path.join(processor_folder, processor, 'config.xml')
-        jenkinsfile_path = os.path.join(jenkinsfiles_folder, f'{processor}.Jenkinsfile')
-        print(jenkinsfile_path)
-
-        # Ensure both config.xml and Jenkinsfile exist
-        if os.path.exists(config_path) and os.path.exists(jenkinsfile_path):
-            print(f'Updating {processor} pipeline...')
-            update_jenkins_pipeline_script(config_path, jenkinsfile_path)
-        else:
-            print(f'Skipping {processor}: Missing config.xml or Jenkinsfile.')
+    # List all processor folders, using the entry type reported by scandir
+    with os.scandir(processor_folder) as entries:
+        processor_names = [entry.name for entry in entries if entry.is_dir()]
+
+    # Each processor's config.xml is independent, so update them in parallel
+    update = functools.partial(
+        update_processor_pipeline,
+        processor_folder=processor_folder,
+        jenkinsfiles_folder=jenkinsfiles_folder,
+    )
+    with ProcessPoolExecutor() as executor:
+        list(executor.map(update, processor_names))
 
 
 def main():
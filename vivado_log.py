@@ -6,37 +6,50 @@ import sys
 from datetime import datetime
 
 
+LUTS_RE = re.compile(
+    r'Slice LUTs\s+\|\s+(?P<used>\d+)\s+\|[^|]+\|[^|]+\|\s+(?P<available>\d+)'
+)
+LOGIC_RE = re.compile(r'LUT as Logic\s+\|\s+(\d+)')
+MEMORY_RE = re.compile(r'LUT as Memory\s+\|\s+(\d+)')
+SLACK_RE = re.compile(r'Slack \(MET\) :\s+(\d+\.\d+)')
+
+
 def parse_vivado_utilization(filename, core, board):
     total_luts = None
     available_luts = None
     logic_luts = None
     memory_luts = None
 
+    # Every value sits on a single table row, so the report is scanned line
+    # by line and reading stops as soon as all of them have been found.
     with open(filename, 'r') as f:
-        content = f.read()
-
-        luts_match = re.search(
-            r'Slice LUTs\s+\|\s+(\d+)\s+\|[^|]+\|[^|]+\|\s+(\d+)', content
-        )
-        if luts_match:
-            total_luts = int(luts_match.group(1))
-            available_luts = int(luts_match.group(2))
-        else:
-            print(
-                'Warning: It was not possible to find total and available LUTs'
-            )
-
-        logic_match = re.search(r'LUT as Logic\s+\|\s+(\d+)', content)
-        if logic_match:
-            logic_luts = int(logic_match.group(1))
-        else:
-            print('Warning: It was not possible to find logic LUTs')
-
-        memory_match = re.search(r'LUT as Memory\s+\|\s+(\d+)', content)
-        if memory_match:
-            memory_luts = int(memory_match.group(1))
-        else:
-            print('Warning: It was not possible to find memory LUTs')
+        for line in f:
+            if total_luts is None:
+                luts_match = LUTS_RE.search(line)
+                if luts_match:
+                    total_luts = int(luts_match.group('used'))
+                    available_luts = int(luts_match.group('available'))
+            if logic_luts is None:
+                logic_match = LOGIC_RE.search(line)
+                if logic_match:
+                    logic_luts = int(logic_match.group(1))
+            if memory_luts is None:
+                memory_match = MEMORY_RE.search(line)
+                if memory_match:
+                    memory_luts = int(memory_match.group(1))
+            if (
+                total_luts is not None
+                and logic_luts is not None
+                and memory_luts is not None
+            ):
+                break
+
+    if total_luts is None:
+        print('Warning: It was not possible to find total and available LUTs')
+    if logic_luts is None:
+        print('Warning: It was not possible to find logic LUTs')
+    if memory_luts is None:
+        print('Warning: It was not possible to find memory LUTs')
 
     results = {
         'processor': core,
@@ -54,22 +67,26 @@ def parse_vivado_utilization(filename, core, board):
 
 
 def parse_vivado_timing(filename):
+    slack = None
     with open(filename, 'r') as f:
-        content = f.read() 
-        slack = re.search(r'Slack \(MET\) :\s+(\d+\.\d+)', content)
-        if slack:
-            slack = float(slack.group(1))
-            period = slack * 10**-9
-            frequency_mhz = int(1 / (period * 10**6))
-        else:
-            print('Warning: It was not possible to find minimum period')
-            frequency_mhz = None
+        for line in f:
+            slack = SLACK_RE.search(line)
+            if slack:
+                break
+
+    if slack:
+        slack = float(slack.group(1))
+        period = slack * 10**-9
+        frequency_mhz = int(1 / (period * 10**6))
+    else:
+        print('Warning: It was not possible to find minimum period')
+        frequency_mhz = None
 
-        results = {
-            'max_freq_mhz': frequency_mhz,
-        }
+    results = {
+        'max_freq_mhz': frequency_mhz,
+    }
 
-        return results
+    return results
 
 
 def write_results(results, output):
@@ -1,9 +1,103 @@
 import re
+import os
 from os import path
 import json
 import argparse
+import functools
 import sys
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+try:
+    import orjson
+except ImportError:  # fall back to the standard library encoder
+    orjson = None
+
+LUTS_RE = re.compile(rb'Total LUT4s:\s+(\d+)/(\d+)\s')
+LOGIC_RE = re.compile(rb'logic LUTs:\s+(\d+)/\d+')
+CARRY_RE = re.compile(rb'carry LUTs:\s+(\d+)/\d+')
+FREQ_PREFIX = b'Max frequency for clock '
+FREQ_RE = re.compile(re.escape(FREQ_PREFIX) + rb'[^\n]+?: (\d+\.\d+) MHz')
+
+SYNTH_RESULTS_DIR = '/eda/synth_results'
+
+# Logs are scanned in blocks of this many bytes instead of all at once
+CHUNK_SIZE = 1 << 20
+
+
+def find_last_frequency(block):
+    """Find the last maximum frequency reported in a block of the log.
+
+    Args:
+        block (bytes): Part of a nextpnr log.
+
+    Returns:
+        float: The frequency in MHz, or None if the block reports none.
+    """
+    end = len(block)
+    while True:
+        start = block.rfind(FREQ_PREFIX, 0, end)
+        if start == -1:
+            return None
+        freq_match = FREQ_RE.match(block, start)
+        if freq_match:
+            return float(freq_match.group(1))
+        end = start
+
+
+def read_line_chunks(file):
+    """Yield the contents of a file in blocks of whole lines.
+
+    Every pattern matches within a single line, so splitting the file after
+    a newline never cuts a match in two.
+
+    Args:
+        file (BinaryIO): The file to read, opened in binary mode.
+
+    Yields:
+        bytes: The next block of lines, of roughly CHUNK_SIZE bytes.
+    """
+    tail = b''
+    while True:
+        chunk = file.read(CHUNK_SIZE)
+        if not chunk:
+            if tail:
+                yield tail
+            return
+        block = tail + chunk
+        cut = block.rfind(b'\n') + 1
+        tail = block[cut:]
+        if cut:
+            yield block[:cut]
+
+
+def read_line_chunks_reversed(file, start):
+    """Yield a file from its end back to an offset in blocks of whole lines.
+
+    Args:
+        file (BinaryIO): The file to read, opened in binary mode.
+        start (int): Offset of a line start where reading stops.
+
+    Yields:
+        bytes: The previous block of lines, starting with the last one.
+    """
+    end = file.seek(0, os.SEEK_END)
+    head = b''
+    while end > start:
+        begin = max(start, end - CHUNK_SIZE)
+        file.seek(begin)
+        block = file.read(end - begin) + head
+        end = begin
+        head = b''
+        if begin > start:
+            # The first line may continue in the preceding block
+            cut = block.find(b'\n') + 1
+            if not cut:
+                head = block
+                continue
+            head = block[:cut]
+            block = block[cut:]
+        yield block
 
 
 def parse_nextpnr_log(filename, core, board):
@@ -13,40 +107,73 @@ def parse_nextpnr_log(filename, core, board):
     carry_luts = None
     max_freq = None
 
-    with open(filename, 'r') as f:
-        content = f.read()
+    # The log is ASCII, so it is searched as bytes without decoding it
+    with open(filename, 'rb') as f:
+        # posix_fadvise is not available on every platform (e.g. Windows)
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
 
-        luts_match = re.search(r'Total LUT4s:\s+(\d+)/(\d+)\s', content)
-        if luts_match:
-            total_luts = int(luts_match.group(1))
-            available_luts = int(luts_match.group(2))
-        else:
-            print('Warning: It was not possible to find LUTs')
+        scanned = 0
+        for block in read_line_chunks(f):
+            scanned += len(block)
 
-        luts_logic_match = re.search(r'logic LUTs:\s+(\d+)/\d+', content)
-        if luts_logic_match:
-            logic_luts = int(luts_logic_match.group(1))
-        else:
-            print('Warning: It was not possible to find logic LUTs')
+            if total_luts is None:
+                luts_match = LUTS_RE.search(block)
+                if luts_match:
+                    total_luts = int(luts_match.group(1))
+                    available_luts = int(luts_match.group(2))
 
-        luts_carry_match = re.search(r'carry LUTs:\s+(\d+)/\d+', content)
-        if luts_carry_match:
-            carry_luts = int(luts_carry_match.group(1))
-        else:
-            print('Warning: It was not possible to find carry LUTs')
+            if logic_luts is None:
+                luts_logic_match = LOGIC_RE.search(block)
+                if luts_logic_match:
+                    logic_luts = int(luts_logic_match.group(1))
 
-        freq_match = re.findall(
-            r'Max frequency for clock .+?: (\d+\.\d+) MHz', content
-        )
-        if freq_match:
-            max_freq = float(freq_match[-1])
+            if carry_luts is None:
+                luts_carry_match = CARRY_RE.search(block)
+                if luts_carry_match:
+                    carry_luts = int(luts_carry_match.group(1))
+
+            # nextpnr reports the frequency after every timing analysis and
+            # only the last one is final
+            block_freq = find_last_frequency(block)
+            if block_freq is not None:
+                max_freq = block_freq
+
+            if (
+                total_luts is not None
+                and logic_luts is not None
+                and carry_luts is not None
+            ):
+                break
         else:
-            print('Warning: It was not possible to find max frequency')
+            scanned = None
+
+        # The LUT counts come early in the log, so once they are known the
+        # last frequency is looked for from the end of the file instead
+        if scanned is not None:
+            for block in read_line_chunks_reversed(f, scanned):
+                block_freq = find_last_frequency(block)
+                if block_freq is not None:
+                    max_freq = block_freq
+                    break
+
+        # The log is read only once, so its pages need not stay cached
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+    if total_luts is None:
+        print('Warning: It was not possible to find LUTs')
+    if logic_luts is None:
+        print('Warning: It was not possible to find logic LUTs')
+    if carry_luts is None:
+        print('Warning: It was not possible to find carry LUTs')
+    if max_freq is None:
+        print('Warning: It was not possible to find max frequency')
 
     results = {
         'processor': core,
         'board': board,
-        'date': datetime.now().strftime('%Y-%m-%d'),
+        'date': time.strftime('%Y-%m-%d'),
         'luts': {
             # "available": available_luts,
             'used': total_luts,
@@ -59,22 +186,67 @@ def parse_nextpnr_log(filename, core, board):
     return results
 
 
+def parse_many(logs):
+    """Parse several nextpnr logs concurrently.
+
+    Parsing is dominated by reading the logs, and file reads release the
+    GIL, so threads let the reads of different logs overlap.
+
+    Args:
+        logs (Iterable[tuple[str, str, str]]): (filename, core, board) for
+            each log.
+
+    Returns:
+        list[dict]: The results of parse_nextpnr_log, in the order of logs.
+    """
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        return list(executor.map(lambda log: parse_nextpnr_log(*log), logs))
+
+
+@functools.lru_cache(maxsize=1)
+def synth_results_dir():
+    """Return the shared synthesis results folder, checking for it only once.
+
+    Returns:
+        str: SYNTH_RESULTS_DIR, or None if it does not exist.
+    """
+    return SYNTH_RESULTS_DIR if path.isdir(SYNTH_RESULTS_DIR) else None
+
+
+def dumps_results(results):
+    """Serialize the results dict as indented JSON.
+
+    Uses orjson when it is installed, so the whole document is encoded in
+    native code and written with a single call.
+
+    Args:
+        results (dict): The synthesis results.
+
+    Returns:
+        str: The JSON document.
+    """
+    if orjson is not None:
+        return orjson.dumps(results, option=orjson.OPT_INDENT_2).decode('utf-8')
+    return json.dumps(results, indent=2)
+
+
 def write_results(results, output):
     if output in ['-', 'stdout']:
-        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write(dumps_results(results))
         return True
-    elif '/' in output:
+    elif path.dirname(output):
         with open(output, 'w') as f:
-            json.dump(results, f, indent=2)
+            f.write(dumps_results(results))
         return True
     else:
-        if path.isdir('/eda/synth_results'):
-            output = f'/eda/synth_results/{output}'
+        results_dir = synth_results_dir()
+        if results_dir:
+            output = path.join(results_dir, output)
             with open(output, 'w') as f:
-                json.dump(results, f, indent=2)
+                f.write(dumps_results(results))
             return True
         else:
-            print('Error: Directory /eda/synth_results does not exist')
+            print(f'Error: Directory {SYNTH_RESULTS_DIR} does not exist')
             return False
 
 
@@ -105,7 +277,14 @@ if __name__ == '__main__':
         args.board,
     )
 
-    if not all(results.values()):
+    # The LUT counts are nested, so check every parsed value explicitly
+    required = (
+        results['luts']['used'],
+        results['luts']['logic'],
+        results['luts']['carry'],
+        results['max_freq_mhz'],
+    )
+    if any(value is None for value in required):
         print('Error: Some information could not be found')
         sys.exit(1)
 